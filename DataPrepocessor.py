@@ -1,8 +1,93 @@
 """Класс для предобработки данных."""
 
 
+from functools import lru_cache
+from os import cpu_count
+
 import numpy as np
-from scipy.signal import butter, detrend, filtfilt
+from scipy.signal import butter
+
+from .fast_preprocessing import block_size, sos_filtfilt_2d
+
+
+@lru_cache(maxsize=32)
+def _design_filter(order, fs, f_low, f_high=None):
+    """
+    Расчёт фильтра Баттерворта с кэшированием.
+
+    Фильтр рассчитывается один раз для каждого набора параметров
+    и переиспользуется при повторных вызовах, поэтому возвращаемый
+    массив защищён от записи.
+
+    Parameters
+    ----------
+    order : int
+        Порядок фильтра.
+
+    fs : int
+        Частота дескретизации сигнала.
+
+    f_low : float | int
+        Нижняя частота среза (Гц).
+
+    f_high : float | int | None, default = None
+        Верхняя частота среза (Гц). При None рассчитывается
+        фильтр верхних частот.
+
+    Returns
+    -------
+    sos : ndarray[dtype: float64, dim = 2]
+        Коэффициенты секций второго порядка, только для чтения.
+        [n_sections, 6]
+
+    """
+    if f_high is None:
+        sos = butter(order, f_low,
+                     btype='high',
+                     analog=False,
+                     fs=fs,
+                     output='sos')
+    else:
+        sos = butter(order, [f_low, f_high],
+                     btype='band',
+                     analog=False,
+                     fs=fs,
+                     output='sos')
+    sos.flags.writeable = False
+
+    return sos
+
+
+def design_filter(order, fs, f_low, f_high=None):
+    """
+    Расчёт фильтра Баттерворта.
+
+    Возвращает копию кэшированного фильтра, пригодную для
+    scipy.signal.sosfilt и sosfiltfilt.
+
+    Parameters
+    ----------
+    order : int
+        Порядок фильтра.
+
+    fs : int
+        Частота дескретизации сигнала.
+
+    f_low : float | int
+        Нижняя частота среза (Гц).
+
+    f_high : float | int | None, default = None
+        Верхняя частота среза (Гц). При None рассчитывается
+        фильтр верхних частот.
+
+    Returns
+    -------
+    sos : ndarray[dtype: float64, dim = 2]
+        Коэффициенты секций второго порядка.
+        [n_sections, 6]
+
+    """
+    return _design_filter(order, fs, f_low, f_high).copy()
 
 
 class DataPreprocessor:
@@ -14,6 +99,11 @@ class DataPreprocessor:
 
     ...
 
+    Attributes
+    ----------
+    n_jobs : int
+        Количество потоков обработки трасс.
+
     Methods
     -------
     decimation(fs_decim)
@@ -24,7 +114,7 @@ class DataPreprocessor:
 
     """
 
-    def __init__(self, data):
+    def __init__(self, data, n_jobs=None):
         """
         Принимает данные для обработки.
 
@@ -33,52 +123,129 @@ class DataPreprocessor:
         data : PassiveData
             Сейсмические пассивные данные.
 
+        n_jobs : int | None, default = None
+            Количество потоков обработки трасс. При None
+            используются все доступные ядра.
+
         """
         self._data = data
+        self.n_jobs = n_jobs
+
+
+    @property
+    def n_jobs(self):
+        """
+        Возвращает количество потоков обработки трасс.
+
+        Returns
+        -------
+        n_jobs : int
+            Количество потоков обработки трасс.
+
+        """
+        return self._n_jobs
 
 
-    def decimation(self, f_max):
+    @n_jobs.setter
+    def n_jobs(self, value):
+        """
+        Устанавливает количество потоков обработки трасс.
+
+        Parameters
+        ----------
+        value : int | None
+            Количество потоков обработки трасс. При None
+            используются все доступные ядра.
+
+        """
+        if value is None:
+            value = cpu_count() or 1
+
+        if not isinstance(value, int):
+            raise ValueError("Количество потоков должно быть целым числом")
+
+        if value <= 0:
+            raise ValueError("Количество потоков должно быть"
+                             " положительным числом")
+
+        self._n_jobs = value
+
+
+    def decimation(self, f_max, padlen=None):
         """
         Прореживание пассивных сейсмических данных.
 
         Прореживание матрицы данных по времени относительно заданой
-        граничной частоты обработки. Включает в себя полосовую
-        фильтрацию и прореживание временных отсчетов данных.
+        граничной частоты обработки. Включает в себя двунаправленную
+        полосовую фильтрацию и прореживание временных отсчетов
+        данных, которые выполняются за один проход.
+
+        Фактор прореживания выбирается так, чтобы граничная частота
+        f_max не превышала 0.8 новой частоты Найквиста: верхняя
+        частота среза фильтра (0.8 новой частоты Найквиста, как в
+        scipy.signal.decimate) не опускается ниже f_max.
 
         Parameters
         ----------
         f_max: int
             Граничная частота обработки (Гц).
 
+        padlen : int | None, default = None
+            Количество отсчётов нечётного продолжения трасс на краях.
+            При None используется значение scipy.signal.sosfiltfilt.
+
         """
         # определение фактора прореживания относительно текущей частоты
-        # Найквиста и заданной граничной частоты обработки
+        # Найквиста и заданной граничной частоты обработки, f_max
+        # остаётся в полосе пропускания фильтра
         fn = self._data.fs // 2
-        resamp = int(fn / f_max)
+        resamp = max(1, int(0.8 * fn / f_max))
         fs_decim = int(self._data.fs / resamp)
 
-        # антиалясинговый (полосой) фильтр для частот в диапазоне
-        # [1: fs_decim - 1]
-        b, a = butter(5, np.array([1, fs_decim - 1]),
-                      btype='band',
-                      analog=False,
-                      fs=self._data.fs)
-
-        filtered_data = np.array([filtfilt(b,
-                                           a,
-                                           self._data.seismogram[:, ii]) \
-                                  for ii in range(self._data.nx)]).T
-
-        # прореживание временных отсчетов в данных
-        data_decim = filtered_data[:: resamp, :] * resamp
+        # полосовой фильтр в виде каскада секций второго порядка,
+        # верхняя частота среза ниже новой частоты Найквиста
+        # (как в scipy.signal.decimate); без прореживания применяется
+        # только фильтр верхних частот
+        if resamp > 1:
+            sos = _design_filter(5, self._data.fs, 1, 0.8 * fs_decim / 2)
+        else:
+            sos = _design_filter(5, self._data.fs, 1)
+
+        # двунаправленная фильтрация и прореживание в одном ядре,
+        # сохраняются только каждые resamp отсчётов
+        data_decim = sos_filtfilt_2d(sos, self._data.seismogram,
+                                     resamp=resamp,
+                                     n_threads=self._n_jobs,
+                                     padlen=padlen)
 
         self._data.seismogram = data_decim
         self._data.fs = fs_decim
 
 
     def detrending(self):
-        """Удаление линейного тренда из данных."""
-        detrended_data = np.array([detrend(self._data.seismogram[:, ii]) \
-                                   for ii in range(self._data.nx)]).T
+        """
+        Удаление линейного тренда из данных.
 
-        self._data.seimsmogram = detrended_data
+        Наклон и среднее значение тренда вычисляются методом
+        наименьших квадратов в замкнутом виде сразу для всех трасс,
+        тренд вычитается на месте блоками трасс, поэтому тренд
+        всей сейсмограммы не хранится в памяти.
+        """
+        seismogram = self._data.seismogram
+        nt = self._data.nt
+
+        # центрированная ось времени, сумма её отсчётов равна нулю,
+        # поэтому наклон не зависит от среднего значения трассы
+        t_c = np.arange(nt, dtype=np.float64) - (nt - 1) / 2
+        denom = t_c @ t_c if nt > 1 else 1.
+        slope = (t_c @ seismogram) / denom
+
+        mean = seismogram.mean(axis=0)
+
+        # тренд блока трасс помещается в кэш L2
+        block = block_size(nt, 8)
+        for c0 in range(0, seismogram.shape[1], block):
+            cols = slice(c0, c0 + block)
+            trend = np.multiply.outer(t_c, slope[cols])
+            trend += mean[cols]
+            seismogram[:, cols] -= trend
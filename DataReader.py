@@ -6,7 +6,6 @@
 """
 
 from pathlib import Path
-from struct import unpack
 from warnings import catch_warnings, simplefilter
 
 import numpy as np
@@ -15,6 +14,43 @@ from segyio import open as open_
 
 from .PassiveData import PassiveData
 
+# Заголовок файла формата baykal
+BAYKAL_HEADER = np.dtype([('channels', '<u2'), # Количество каналов
+                          ('_pad0', 'V2'),
+                          ('version', '<u2'), # Версия
+                          ('day', '<u2'), # День
+                          ('month', '<u2'), # Месяц
+                          ('year', '<u2'), # Год
+                          ('_pad1', 'V6'),
+                          ('adc_bits', '<u2'), # Разрядность АЦП
+                          ('_pad2', 'V2'),
+                          ('freq', '<u2'), # Частота дискретизации
+                          ('_pad3', 'V8'),
+                          ('station', 'S9'), # Название станции
+                          ('_pad4', 'V31'),
+                          ('lat', '<f8'), # Широта
+                          ('lon', '<f8'), # Долгота
+                          ('_pad5', 'V16'),
+                          ('t0', '<u8'), # Начальное время
+                          ('_pad6', 'V8')])
+
+# Описание канала в файле формата baykal
+BAYKAL_CHANNEL = np.dtype([('number', '<u2'), # Номер канала
+                           ('_pad0', 'V6'),
+                           ('name', '<i4', (6,)), # Имя канала
+                           ('sensor', '<i4', (6,)), # Тип сенсора
+                           ('coef', '<f8'), # Коэффициент канала
+                           ('_pad1', 'V8')])
+
+# Отсчёт данных в файле формата baykal
+BAYKAL_SAMPLE = np.dtype('<i4')
+
+# Наибольшее правдоподобное количество отсчётов в трассе segy
+SEGY_MAX_SAMPLES = 1_000_000
+
+# Размер блока отсчётов, считываемого из отображённого файла за раз
+TILE_BYTES = 8 * 1024 * 1024
+
 
 class DataLoader:
     """
@@ -38,9 +74,12 @@ class DataLoader:
     component : str | None
             Компонетна данных.
 
+    high_precision : bool
+            Флаг чтения segy-данных с типом float64.
+
     Methods
     -------
-    read_segy(path)
+    read_segy(path, high_precision=False)
         Читение файлы формата segy.
 
     read_baykal(path)
@@ -54,7 +93,8 @@ class DataLoader:
     def __init__(self, path,
                  format,
                  n_components="3C",
-                 component="Z"):
+                 component="Z",
+                 high_precision=False):
         """
         Установка необходимых параметров для считыания данных.
 
@@ -74,11 +114,16 @@ class DataLoader:
             Компонента данных.
             {"Z", "X", "Y"}
 
+        high_precision : bool, default = False
+            Флаг чтения segy-данных с типом float64. По умолчанию
+            данные читаются с типом float32, как хранятся в файле.
+
         """
         self.path = path
         self.format = format
         self.n_components = n_components
         self.component = component
+        self.high_precision = high_precision
 
 
     @property
@@ -216,13 +261,47 @@ class DataLoader:
         self._component = value
 
 
+    @property
+    def high_precision(self):
+        """
+        Возвращает флаг чтения segy-данных с типом float64.
+
+        Returns
+        -------
+        high_precision : bool
+            Флаг чтения segy-данных с типом float64.
+
+        """
+        return self._high_precision
+
+
+    @high_precision.setter
+    def high_precision(self, value):
+        """
+        Принимает флаг чтения segy-данных с типом float64.
+
+        Parameters
+        ----------
+        value : bool
+            Флаг чтения segy-данных с типом float64.
+
+        """
+        if not isinstance(value, bool):
+            raise ValueError("Флаг точности должен быть типа bool")
+
+        self._high_precision = value
+
+
     @staticmethod
     def _open_check_warn(path):
         """
         Перехватывает предупреждение.
 
-        Перехватывание предупреждения о том, что endian неверен и
-        открываем с другим endian.
+        Файл пробно открывается с endian='big'. Если при этом
+        возникает ошибка, предупреждение или количество отсчётов
+        в трассе неправдоподобно, пробный файл закрывается и
+        открывается с endian='little'. Файл открывается не более
+        двух раз.
 
         Parameters
         ----------
@@ -235,21 +314,23 @@ class DataLoader:
             Открытый segy-файл.
 
         """
-        with catch_warnings(record=True) as w:
-            simplefilter("always")
-            try:
+        try:
+            with catch_warnings(record=True) as w:
+                simplefilter("always")
                 segy_file = open_(path, ignore_geometry=True, endian='big')
-            except Exception as e: # Выяснить какой тип ошибки соответсвует
-                                   # неверному endian
-                print(f"Исключение: {e}")
-                segy_file = open_(path, ignore_geometry=True, endian='little')
-            if w:
-                segy_file = open_(path, ignore_geometry=True, endian='little')
-        return segy_file
+        except RuntimeError: # при неверном endian размер трасс
+                             # противоречит размеру файла
+            pass
+        else:
+            if not w and 0 < len(segy_file.samples) < SEGY_MAX_SAMPLES:
+                return segy_file
+            segy_file.close()
+
+        return open_(path, ignore_geometry=True, endian='little')
 
 
     @staticmethod
-    def read_segy(path):
+    def read_segy(path, high_precision=False):
         """
         Читает файлы формата segy.
 
@@ -261,9 +342,12 @@ class DataLoader:
         path : srt
             Путь до файла.
 
+        high_precision : bool, default = False
+            Флаг приведения данных к типу float64.
+
         Returns
         -------
-        data : ndarray[dtype: float64, dim = 2]
+        data : ndarray[dtype: float32 | float64, dim = 2]
             Двумерный массив данных.
             [tempor_axis, spatial_axis]
 
@@ -271,10 +355,18 @@ class DataLoader:
             Время дексретизации в секундах.
 
         """
-        segy_file = DataLoader._open_check_warn(path)
-        data = np.array([np.copy(tr) for tr in segy_file.trace[:]],
-                        dtype=np.float64).T
-        dt = dt_(segy_file) * 1e-6
+        with DataLoader._open_check_warn(path) as segy_file:
+            try:
+                # чтение всех трасс одним массивом
+                # [trace_axis, tempor_axis]
+                traces = segy_file.trace.raw[:]
+            except AttributeError:
+                traces = np.array([np.copy(tr)
+                                   for tr in segy_file.trace[:]])
+            dt = dt_(segy_file) * 1e-6
+
+        dtype = np.float64 if high_precision else np.float32
+        data = np.ascontiguousarray(traces.T, dtype=dtype)
         return data, dt
 
 
@@ -284,7 +376,8 @@ class DataLoader:
         Читает файлы формата baykal.
 
         Чтение файлов формата baykal, выполняется чтение байтов
-        файла.
+        заголовка файла, отсчёты данных отображаются в память
+        без чтения всего файла.
 
         Parameters
         ----------
@@ -293,8 +386,9 @@ class DataLoader:
 
         Returns
         -------
-        data : ndarray[dtype: float64, dim = 2]
-            Двумерный массив данных.
+        data : memmap[dtype: int32, dim = 2]
+            Двумерный массив данных, отображённый в память
+            только для чтения.
             [tempor_axis, spatial_axis]
 
         dt : float
@@ -302,47 +396,57 @@ class DataLoader:
 
         """
         with Path(path).open('rb') as f:
-            channels = unpack('H', f.read(2))[0] # Колличество каналов
-            f.read(2)
-            _ = unpack('H', f.read(2))[0] # Версия
-            _ = unpack('H', f.read(2))[0] # День
-            _ = unpack('H', f.read(2))[0] # Месяц
-            _ = unpack('H', f.read(2))[0] # Год
-            f.read(6)
-            _ = unpack('H', f.read(2))[0] # Разрядность АЦП
-            f.read(2)
-            freq = unpack('H', f.read(2))[0] # Частота дискретизации
-            f.read(8)
-            station_name = unpack('9s7c', f.read(16))[0] # Название станции
-            station_name = str(station_name).replace('b', '')
-            station_name = station_name.replace("'", '')
-            f.read(24)
-            _ = unpack('d', f.read(8))[0] # Широта
-            _ = unpack('d', f.read(8))[0] # Долгота
-            f.read(16)
-            _ = unpack('Q', f.read(8))[0] # Начальное время
-            f.read(8)
-            channels_number = [] # номер канала
-            channels_name = [] # имя канала
-            sensors_type = [] # тип сенсора
-            channels_coef = [] # коэффициент канала
-            for i in range(channels):
-                # Номер канала
-                channels_number.append(unpack('H', f.read(2))[0])
-                f.read(6)
-                # Имя канала
-                channels_name.append(unpack('6i', f.read(24))[0])
-                # Тип сенсора
-                sensors_type.append(unpack('6i', f.read(24))[0])
-                # Коэффициент канала
-                channels_coef.append(unpack('d', f.read(8))[0])
-                f.read(8)
-
-            data = np.fromfile(f, dtype = 'int')
-            data = np.reshape(data, [channels, len(data) // channels],
-                              order='F')
-            dt = 1 / freq
-            return data.T, dt
+            header = np.fromfile(f, dtype=BAYKAL_HEADER, count=1)
+            if header.size == 0:
+                raise ValueError("Файл не содержит заголовка")
+
+            channels = int(header['channels'][0])
+            freq = int(header['freq'][0])
+
+            # таблица каналов считывается одним блоком
+            _ = np.fromfile(f, dtype=BAYKAL_CHANNEL, count=channels)
+
+            header_end = f.tell()
+            file_size = f.seek(0, 2)
+
+        # отсчёты 32-битного АЦП записаны поочерёдно по каналам,
+        # данные отображаются в память и считываются по требованию
+        nt = (file_size - header_end) // BAYKAL_SAMPLE.itemsize // channels
+        data = np.memmap(path, dtype=BAYKAL_SAMPLE, mode='r',
+                         offset=header_end, shape=(nt, channels))
+        dt = 1 / freq
+        return data, dt
+
+
+    @staticmethod
+    def _tiled_float64(data):
+        """
+        Приводит отображённые в память отсчёты к float64 блоками.
+
+        Отсчёты считываются из файла блоками строк размером около
+        TILE_BYTES, поэтому в памяти одновременно находятся только
+        результат и один блок исходных отсчётов.
+
+        Parameters
+        ----------
+        data : memmap[dtype: int32, dim = 2]
+            Отображённый в память массив данных.
+            [tempor_axis, spatial_axis]
+
+        Returns
+        -------
+        data : ndarray[dtype: float64, dim = 2]
+            Массив данных в памяти.
+            [tempor_axis, spatial_axis]
+
+        """
+        nt, nx = data.shape
+        out = np.empty((nt, nx), dtype=np.float64)
+        rows = max(1, TILE_BYTES // max(1, nx * data.strides[1]))
+        for t_0 in range(0, nt, rows):
+            out[t_0 : t_0 + rows] = data[t_0 : t_0 + rows]
+
+        return out
 
 
     def read_data(self):
@@ -360,7 +464,8 @@ class DataLoader:
         """
         if self._format == "segy":
             try:
-                data, dt = DataLoader.read_segy(self._path)
+                data, dt = DataLoader.read_segy(self._path,
+                                                self._high_precision)
             except RuntimeError:
                 raise ValueError("Неверный тип данных")
 
@@ -378,6 +483,9 @@ class DataLoader:
             elif self._component == 'Y':
                 data = data[:,3::3]
 
+        if isinstance(data, np.memmap):
+            data = DataLoader._tiled_float64(data)
+
         return PassiveData(data = data,
                            dt = dt)
 
@@ -1,7 +1,9 @@
 """Класс для отображение энергии после обработки методом PMASW."""
 
 import numpy as np
+from matplotlib.collections import LineCollection
 from matplotlib.ticker import FormatStrFormatter
+from scipy.ndimage import gaussian_filter
 
 
 class EnergyPlotter:
@@ -13,10 +15,11 @@ class EnergyPlotter:
     draw_seismogram(ax, data, dt, dx, scale=2, fontsize=18)
         Отображение сеймограмм.
 
-    draw_vf2d(ax, spectrum, vel, freq, norm=True, fontsize=18)
+    draw_vf2d(ax, spectrum, vel, freq, norm=True, fontsize=18, sigma=0.8)
         Отображение зависимости энергии от скорости и частоты.
 
-    draw_f_theta(ax, f_theta, freq, thetas, norm=True, fontsize=18)
+    draw_f_theta(ax, f_theta, freq, thetas, norm=True, fontsize=18,
+                 sigma=0.8)
         Отображение зависимости энергии от частоты и азимута.
 
     """
@@ -49,15 +52,23 @@ class EnergyPlotter:
 
         """
         nt, nx = data.shape
-        receivers = np.arange(0, nx * dx, dx)
-        for i in range(nx):
-            trace_norm = scale * data[:, i] / np.max(data[:, i])
-            tmp_offset = min(receivers) + dx * i
-            x = trace_norm + tmp_offset
-            time = np.arange(0, nt * dt, dt)[: len(x)]
-            ax.plot(x, time, color='k')
+        offsets = np.arange(nx) * dx
+        time = np.arange(nt) * dt
+
+        # нормировка трасс по модулю амплитуды, нулевые трассы
+        # остаются нулевыми
+        maxes = np.max(np.abs(data), axis=0, keepdims=True)
+        maxes[maxes == 0] = 1.
+        traces = scale * data / maxes
+
+        # все трассы отображаются одной коллекцией линий
+        segments = np.empty((nx, nt, 2))
+        segments[:, :, 0] = (traces + offsets).T
+        segments[:, :, 1] = time
+        ax.add_collection(LineCollection(segments, colors='k'))
+
         ax.set_ylim([nt * dt, 0])
-        ax.set_xlim([min(receivers) - dx, max(receivers) + dx])
+        ax.set_xlim([offsets[0] - dx, offsets[-1] + dx])
         ax.set_xlabel(r"$x$ (м)", fontsize=fontsize)
         ax.set_ylabel(r"$t$ (с)", fontsize=fontsize)
         ax.tick_params(axis='both', labelsize=fontsize)
@@ -65,7 +76,8 @@ class EnergyPlotter:
 
 
     @staticmethod
-    def draw_vf2d(ax, spectrum, vel, freq, norm=True, fontsize=18):
+    def draw_vf2d(ax, spectrum, vel, freq, norm=True, fontsize=18,
+                  sigma=0.8):
         """
         Отображение зависимости энергии от скорости и частоты.
 
@@ -90,10 +102,16 @@ class EnergyPlotter:
         fontsize : optional | int | float, default = 2
             Размер шрифта подписей осей и отметок осей.
 
+        sigma : optional | int | float, default = 0.8
+            Ширина гауссова сглаживания изображения в пикселях.
+
         """
         if norm:
             spectrum = spectrum / np.max(spectrum, axis=0)
 
+        # изображение сглаживается однократно до отрисовки
+        spectrum = gaussian_filter(spectrum, sigma=sigma)
+
         ax.imshow(spectrum,
                   aspect='auto',
                   extent=(freq.min(),
@@ -103,14 +121,15 @@ class EnergyPlotter:
                           ),
                   cmap='RdYlBu_r',
                   origin='lower',
-                  interpolation='gaussian')
+                  interpolation='nearest')
         ax.set_xlabel(r"$f$ (Гц)", fontsize=fontsize)
         ax.set_ylabel(r"$V_R$ (м/с)", fontsize=fontsize)
         ax.tick_params(axis='both', labelsize=fontsize)
 
 
     @staticmethod
-    def draw_f_theta(ax, f_theta, freq, thetas, norm=True, fontsize=18):
+    def draw_f_theta(ax, f_theta, freq, thetas, norm=True, fontsize=18,
+                     sigma=0.8):
         """
         Отображение зависимости энергии от частоты и азимута.
 
@@ -135,9 +154,16 @@ class EnergyPlotter:
         fontsize : optional | int | float, default = 2
             Размер шрифта подписей осей и отметок осей.
 
+        sigma : optional | int | float, default = 0.8
+            Ширина гауссова сглаживания изображения в пикселях.
+
         """
         if norm:
-            f_theta = (f_theta.T / f_theta.T.max(axis=0)).T
+            f_theta = f_theta / np.maximum(f_theta.max(axis=1, keepdims=True),
+                                           1e-30)
+
+        # сглаживание f_theta выполняется однократно перед построением
+        f_theta = gaussian_filter(f_theta, sigma=sigma)
 
         ax.imshow(f_theta,
                   aspect='auto',
@@ -147,7 +173,7 @@ class EnergyPlotter:
                           freq.min()
                           ),
                   cmap='RdYlBu_r',
-                  interpolation='gaussian')
+                  interpolation='nearest')
 
         ax.set_xlabel("Азимут, $^o$", fontsize=fontsize)
         ax.set_ylabel("Частота, Гц", fontsize=fontsize)
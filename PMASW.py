@@ -1,11 +1,32 @@
 """Класс обработки методом PMASW."""
 
 import numpy as np
+from scipy import fft
 from tqdm import trange
 
+from .batch_pmasw import (
+    accumulate_modulus,
+    compute_energy_spectrum_,
+    fftw_rfft,
+    get_array_module,
+    steering_factors,
+    window_block,
+)
 from .fast_pmasw import compute_energy_
 
+BACKENDS = ('native', 'numpy', 'cuda')
+CONFIG_PARAMS = ('dt', 'nt', 'overlap', 'backend',
+                 'f_min', 'f_max', 'v_min', 'v_max', 'v_step',
+                 'theta_min', 'theta_max', 'theta_step')
 PI = 3.1415926535897932384626433832
+DEG2RAD = PI / 180
+RAD2DEG = 180 / PI
+
+# Наибольшее количество хранимых планов pyfftw
+FFT_PLAN_CACHE = 8
+
+# Допустимое отклонение частоты от отсчёта rfft окна (в долях шага)
+FREQ_BIN_TOL = 1e-6
 
 
 class PMASW:
@@ -53,6 +74,14 @@ class PMASW:
     overlap : int
         Процент перекрытия окон.
 
+    backend : str
+        Способ вычисления энергии: 'native' - расширение fast_pmasw,
+        окна обрабатываются по одному; 'numpy' - окна обрабатываются
+        пакетно на CPU порциями, в памяти хранятся спектры только
+        одной порции окон; 'cuda' - окна обрабатываются пакетно на
+        GPU, необходим пакет cupy, на устройстве одновременно хранятся
+        сейсмограмма и спектры всех окон.
+
     energy : ndarray[dtype: float64, dim = 3]
         Энергия для скоростей, частот и азимутов.
         [vel_axis, freq_axis, azi_axis]
@@ -67,6 +96,9 @@ class PMASW:
 
     Methods
     -------
+    configure(**params)
+        Устанавливает несколько параметров за один вызов.
+
     define_velocities()
         Устанавливает набор фазовых скоростей.
 
@@ -76,12 +108,12 @@ class PMASW:
     define_freqs()
         Устанавливает набор частот.
 
-    compute_energy(data, recievers)
+    compute_energy(data, recievers, n_threads=1)
         Вычисление энергии для всех скоростей, частот, азимутов.
 
     """
 
-    def __init__(self, dt, nt, v_max, f_max):
+    def __init__(self, dt, nt, v_max, f_max, backend='native'):
         """
         Создание необходимых параметров для обработки.
 
@@ -99,14 +131,17 @@ class PMASW:
         f_max : float | int
             Максимальная частота.
 
+        backend : str, default = 'native'
+            Способ вычисления энергии, 'native', 'numpy' или 'cuda'.
+
         """
         # Установка значений по умолчанию
         self._f_min = 0.
         self._v_min = 1.
         self._v_step = 10.
-        self._theta_min = PI * (0 / 180)
-        self._theta_max = PI * (180 / 180)
-        self._theta_step = PI * (5 / 180)
+        self._theta_min = 0 * DEG2RAD
+        self._theta_max = 180 * DEG2RAD
+        self._theta_step = 5 * DEG2RAD
         self._freqs = np.array([])
         self._velocities = np.array([])
         self._thetas = np.array([])
@@ -115,15 +150,68 @@ class PMASW:
         self._overlap = 50
         self._v_max = 100.
         self._f_max = 100.
-        self._energy = np.array([])
+        self._energy = np.zeros((0, 0, 0))
         self._en_vel_freq = np.array([])
         self._en_f_theta = np.array([])
+        self._energy_version = 0
+        self._vf_version = -1
+        self._f_theta_version = -1
+        self._freq_bin_idx = np.array([], dtype=np.int64)
+        self._dirty = {'velocities', 'thetas', 'freqs'}
+        self._steering = None
+        self._steering_device = None
+        self._fft_plans = {}
+        self._steering_x = np.array([])
+        self._steering_y = np.array([])
 
         self.dt = dt
         self.nt = nt
         self.v_max = v_max
         self.f_max = f_max
-        self.define_thetas()
+        self.backend = backend
+
+
+    def configure(self, **params):
+        """
+        Устанавливает несколько параметров за один вызов.
+
+        Параметры проверяются теми же сеттерами, но в порядке, при
+        котором проверки пар минимум-максимум не зависят от порядка
+        аргументов. Наборы скоростей, азимутов, частот и фазовые
+        множители перестраиваются один раз при первом использовании.
+        При ошибке все параметры возвращаются к прежним значениям.
+
+        Parameters
+        ----------
+        **params : float | int | str
+            Новые значения параметров, имена из CONFIG_PARAMS.
+
+        """
+        unknown = set(params) - set(CONFIG_PARAMS)
+        if unknown:
+            raise ValueError(f"Неизвестные параметры: {sorted(unknown)}")
+
+        # если новый минимум не меньше текущего максимума, сначала
+        # устанавливается максимум
+        order = list(CONFIG_PARAMS)
+        for low, high in (('f_min', 'f_max'),
+                          ('v_min', 'v_max'),
+                          ('theta_min', 'theta_max')):
+            value = params.get(low)
+            if isinstance(value, (int, float)) and value >= getattr(self,
+                                                                   high):
+                i_low, i_high = order.index(low), order.index(high)
+                order[i_low], order[i_high] = high, low
+
+        state = dict(self.__dict__)
+        state['_dirty'] = set(self._dirty)
+        try:
+            for name in order:
+                if name in params:
+                    setattr(self, name, params[name])
+        except ValueError:
+            self.__dict__.update(state)
+            raise
 
 
     @property
@@ -151,7 +239,7 @@ class PMASW:
             Время дескретизации сигнала.
 
         """
-        if (not isinstance(value, float)) and (not isinstance(value, int)):
+        if not isinstance(value, (int, float)):
             raise ValueError("Время дескретизации должно быть числом")
 
         if value <= 0:
@@ -159,7 +247,8 @@ class PMASW:
                              " положительным числом")
 
         self._dt = float(value)
-        self.define_freqs()
+        self._fft_plans = {}
+        self._invalidate('freqs')
 
 
     @property
@@ -187,7 +276,7 @@ class PMASW:
             Минимальная фазовая скорость.
 
         """
-        if (not isinstance(value, float)) and (not isinstance(value, int)):
+        if not isinstance(value, (int, float)):
             raise ValueError("Минимальная фазовая скорость должна быть числом")
 
         if value <= 0:
@@ -199,7 +288,7 @@ class PMASW:
                              " меньше максимальной фазовой скорости")
 
         self._v_min = float(value)
-        self.define_velocities()
+        self._invalidate('velocities')
 
 
     @property
@@ -227,7 +316,7 @@ class PMASW:
             Максимальная фазовая скорость.
 
         """
-        if (not isinstance(value, float)) and (not isinstance(value, int)):
+        if not isinstance(value, (int, float)):
             raise ValueError("Максимальная фазовая скорость должна"
                              " быть числом")
 
@@ -240,7 +329,7 @@ class PMASW:
                              " больше минимальной фазовой скорости")
 
         self._v_max = float(value)
-        self.define_velocities()
+        self._invalidate('velocities')
 
 
     @property
@@ -268,7 +357,7 @@ class PMASW:
             Шаг по фазовым скоростям.
 
         """
-        if (not isinstance(value, float)) and (not isinstance(value, int)):
+        if not isinstance(value, (int, float)):
             raise ValueError("Шаг по фазовым скоростям должен быть числом")
 
         if value <= 0:
@@ -276,7 +365,7 @@ class PMASW:
                              " положительным числом")
 
         self._v_step = float(value)
-        self.define_velocities()
+        self._invalidate('velocities')
 
 
     @property
@@ -304,7 +393,7 @@ class PMASW:
             Минимальная частота.
 
         """
-        if (not isinstance(value, float)) and (not isinstance(value, int)):
+        if not isinstance(value, (int, float)):
             raise ValueError("Минимальная частота должна быть числом")
 
         if value <= 0:
@@ -316,7 +405,7 @@ class PMASW:
                              " меньше максимальной частоты")
 
         self._f_min = float(value)
-        self.define_freqs()
+        self._invalidate('freqs')
 
 
     @property
@@ -344,7 +433,7 @@ class PMASW:
             Максимальная частота.
 
         """
-        if (not isinstance(value, float)) and (not isinstance(value, int)):
+        if not isinstance(value, (int, float)):
             raise ValueError("Максимальная частота должна быть числом")
 
         if value <= 0:
@@ -360,7 +449,7 @@ class PMASW:
                             " минимальной частоты")
 
         self._f_max = float(value)
-        self.define_freqs()
+        self._invalidate('freqs')
 
 
     @property
@@ -374,9 +463,7 @@ class PMASW:
             Минимальный азимут в градусах.
 
         """
-        theta_min_deg = 180 * (self._theta_min / PI)
-
-        return theta_min_deg
+        return self._theta_min * RAD2DEG
 
 
     @theta_min.setter
@@ -390,18 +477,18 @@ class PMASW:
             Минимальный азимут в градусах.
 
         """
-        if (not isinstance(value, float)) and (not isinstance(value, int)):
+        if not isinstance(value, (int, float)):
             raise ValueError("Минимальный азимут должен быть числом")
 
         if value > 360:
             value %= 360
 
-        if PI * (value / 180) > self._theta_max:
+        if value * DEG2RAD > self._theta_max:
             raise ValueError("Минимальный азимут должен быть меньше"
                              " либо равен максимальному азимуту")
 
-        self._theta_min = PI * (value / 180)
-        self.define_thetas()
+        self._theta_min = value * DEG2RAD
+        self._invalidate('thetas')
 
 
     @property
@@ -415,9 +502,7 @@ class PMASW:
             Максимальный азимут в градусах.
 
         """
-        theta_max_deg = 180 * (self._theta_max / PI)
-
-        return theta_max_deg
+        return self._theta_max * RAD2DEG
 
 
     @theta_max.setter
@@ -431,18 +516,18 @@ class PMASW:
             Максимальный азимут в градусах.
 
         """
-        if (not isinstance(value, float)) and (not isinstance(value, int)):
+        if not isinstance(value, (int, float)):
             raise ValueError("Максимальный азимут должен быть числом")
 
         if value > 360:
             value %= 360
 
-        if PI * (value / 180) < self._theta_min:
+        if value * DEG2RAD < self._theta_min:
             raise ValueError("Максимальный азимут должен быть больше"
                              " либо равен минимальному азимуту")
 
-        self._theta_max = PI * (value / 180)
-        self.define_thetas()
+        self._theta_max = value * DEG2RAD
+        self._invalidate('thetas')
 
 
     @property
@@ -456,9 +541,7 @@ class PMASW:
             Шаг по азимутам в градусах.
 
         """
-        theta_step_deg = 180 * (self._theta_step / PI)
-
-        return theta_step_deg
+        return self._theta_step * RAD2DEG
 
 
     @theta_step.setter
@@ -472,13 +555,16 @@ class PMASW:
             Шаг по азимутам в градусах.
 
         """
-        if (not isinstance(value, float)) and (not isinstance(value, int)):
+        if not isinstance(value, (int, float)):
             raise ValueError("Шаг по азимутам должен быть числом")
 
-        if value > 360:
-            value %= 360
-        self._theta_step = PI * (value / 180)
-        self.define_thetas()
+        # шаг не является азимутом и не приводится к диапазону 0-360
+        if value <= 0:
+            raise ValueError("Шаг по азимутам должен быть"
+                             " положительным числом")
+
+        self._theta_step = value * DEG2RAD
+        self._invalidate('thetas')
 
 
     @property
@@ -515,7 +601,8 @@ class PMASW:
                              " быть положительным числом")
 
         self._nt = value
-        self.define_freqs()
+        self._fft_plans = {}
+        self._invalidate('freqs')
 
 
     @property
@@ -557,6 +644,41 @@ class PMASW:
         self._overlap = value
 
 
+    @property
+    def backend(self):
+        """
+        Возвращает способ вычисления энергии.
+
+        Returns
+        -------
+        backend : str
+            Способ вычисления энергии.
+
+        """
+        return self._backend
+
+
+    @backend.setter
+    def backend(self, value):
+        """
+        Устанавливает способ вычисления энергии.
+
+        Parameters
+        ----------
+        value : str
+            Способ вычисления энергии, 'native', 'numpy' или 'cuda'.
+
+        """
+        if value not in BACKENDS:
+            raise ValueError("Способ вычисления энергии должен быть"
+                             f" одним из {BACKENDS}")
+
+        # проверка наличия cupy до начала вычислений
+        get_array_module(value)
+
+        self._backend = value
+
+
     @property
     def velocities(self):
         """
@@ -568,6 +690,9 @@ class PMASW:
             Массив фазовых скоростей.
 
         """
+        if 'velocities' in self._dirty:
+            self.define_velocities()
+
         return self._velocities
 
 
@@ -593,7 +718,7 @@ class PMASW:
             raise ValueError("Подаваемый массив должен состоять из типов"
                              "данных float64 или int32")
 
-        if any(value <= 0):
+        if value.min() <= 0:
             raise ValueError("Подаваемый массив должен состоять из "
                              "положительных чисел")
 
@@ -601,6 +726,8 @@ class PMASW:
             raise ValueError("Размер массива должен быть равен 1")
 
         self._velocities = value
+        self._dirty.discard('velocities')
+        self._invalidate()
 
 
     def define_velocities(self):
@@ -614,6 +741,8 @@ class PMASW:
                                      self._v_max + self._v_step,
                                      self._v_step,
                                      dtype=np.float64)
+        self._dirty.discard('velocities')
+        self._invalidate()
 
 
     @property
@@ -627,8 +756,10 @@ class PMASW:
             Массив азимутов в градусах.
 
         """
-        thetas_deg = 180 * (self._thetas / PI)
-        return thetas_deg
+        if 'thetas' in self._dirty:
+            self.define_thetas()
+
+        return self._thetas * RAD2DEG
 
 
     @thetas.setter
@@ -656,7 +787,9 @@ class PMASW:
         if len(value.shape) != 1:
             raise ValueError("Размер массива должен быть равен 1")
 
-        self._thetas = PI * (value % 360 / 180)
+        self._thetas = value % 360 * DEG2RAD
+        self._dirty.discard('thetas')
+        self._invalidate()
 
 
     def define_thetas(self):
@@ -670,6 +803,8 @@ class PMASW:
                                      self._theta_max,
                                      self._theta_step,
                                      dtype=np.float64)
+        self._dirty.discard('thetas')
+        self._invalidate()
 
 
     @property
@@ -683,6 +818,9 @@ class PMASW:
             Массив частот в Гц.
 
         """
+        if 'freqs' in self._dirty:
+            self.define_freqs()
+
         return self._freqs
 
 
@@ -708,18 +846,46 @@ class PMASW:
             raise ValueError("Подаваемый массив должен состоять из типов"
                              "данных float64 или int32")
 
-        if any(value < 0):
-            raise ValueError("Подаваемый массив должен состоять из "
-                             "неотрицательных чисел")
-
         if len(value.shape) != 1:
             raise ValueError("Размер массива должен быть равен 1")
 
-        if any(value > 1 / self._dt / 2):
+        # границы проверяются по минимуму и максимуму массива
+        # без промежуточных логических массивов
+        if value.min() < 0:
+            raise ValueError("Подаваемый массив должен состоять из "
+                             "неотрицательных чисел")
+
+        if value.max() > 1 / self._dt / 2:
             raise ValueError("Подаваемый массив должен состоять из "
                              "частот меньших частоты Найквиста")
 
         self._freqs = value
+        self._freq_bin_idx = self._compute_freq_bins()
+        self._dirty.discard('freqs')
+        self._invalidate()
+
+
+    def _compute_freq_bins(self):
+        """
+        Вычисляет индексы отсчётов спектра окна для набора частот.
+
+        Индексы используются, только если все частоты freqs совпадают
+        с отсчётами rfft окна длиной nt (кратны 1 / (nt * dt)).
+
+        Returns
+        -------
+        freq_bin_idx : ndarray[dtype: int64, dim = 1] | None
+            Индексы отсчётов rfft окна, соответствующих частотам
+            freqs, или None, если хотя бы одна частота не совпадает
+            с отсчётом.
+
+        """
+        bins = self._freqs * self._nt * self._dt
+        freq_bin_idx = np.round(bins)
+        if np.any(np.abs(bins - freq_bin_idx) > FREQ_BIN_TOL):
+            return None
+
+        return freq_bin_idx.astype(np.int64)
 
 
     def define_freqs(self):
@@ -735,6 +901,9 @@ class PMASW:
                                 self._f_max + self._df,
                                 self._df,
                                 dtype=np.float64)
+        self._freq_bin_idx = self._compute_freq_bins()
+        self._dirty.discard('freqs')
+        self._invalidate()
 
 
     @property
@@ -742,6 +911,9 @@ class PMASW:
         """
         Возвращает энергию для всех скоростей, частот, азимутов.
 
+        Энергия хранится в порядке осей [freq_axis, vel_axis,
+        azi_axis], возвращается представление без копирования.
+
         Returns
         -------
         energy: ndarray[dtype: float64, dim = 3]
@@ -749,7 +921,39 @@ class PMASW:
             [vel_axis, freq_axis, azi_axis]
 
         """
-        return self._energy
+        return self._energy.transpose(1, 0, 2)
+
+
+    def _invalidate(self, *grids):
+        """
+        Помечает наборы параметров для перестроения.
+
+        Вызывается сеттерами вместо немедленного перестроения
+        наборов, поэтому несколько изменений подряд приводят к одному
+        перестроению при первом использовании. Сбрасывает фазовые
+        множители, зависящие от наборов.
+
+        Parameters
+        ----------
+        *grids : str
+            Имена наборов: 'velocities', 'thetas', 'freqs'.
+
+        """
+        self._dirty.update(grids)
+        self._steering = None
+        self._steering_device = None
+
+
+    def _update_grids(self):
+        """Перестраивает помеченные наборы скоростей, азимутов, частот."""
+        if 'velocities' in self._dirty:
+            self.define_velocities()
+
+        if 'thetas' in self._dirty:
+            self.define_thetas()
+
+        if 'freqs' in self._dirty:
+            self.define_freqs()
 
 
     def _create_window(self, position_rec_x):
@@ -757,7 +961,288 @@ class PMASW:
                         len(position_rec_x), axis=1)
 
 
-    def compute_energy(self, data, recievers):
+    def _window_view(self, seismogram, nt_step, xp=np):
+        """
+        Возвращает все полные окна сейсмограммы без копирования.
+
+        Parameters
+        ----------
+        seismogram : ndarray[dtype: float64 | float32, dim = 2]
+            Массив сейсмической записи, массив numpy или cupy.
+            [tempor_axis, spatial_axis]
+
+        nt_step : int
+            Шаг окон по времени в отсчётах.
+
+        xp : module, default = numpy
+            Модуль массива seismogram (numpy или cupy).
+
+        Returns
+        -------
+        windows : ndarray[dtype: float64 | float32, dim = 3]
+            Окна сейсмограммы, представление массива seismogram.
+            [window_axis, tempor_axis, spatial_axis]
+
+        """
+        n_win = (seismogram.shape[0] - self._nt) // nt_step + 1
+        stride_t, stride_x = seismogram.strides
+
+        return xp.lib.stride_tricks.as_strided(
+            seismogram,
+            shape=(n_win, self._nt, seismogram.shape[1]),
+            strides=(nt_step * stride_t, stride_t, stride_x))
+
+
+    def _rfft(self, windows, taper, n_threads):
+        """
+        Вычисляет спектры окон с весовой функцией на CPU.
+
+        При наличии pyfftw план преобразования строится один раз
+        для размера, типа окон и количества потоков и переиспользуется
+        между порциями окон и вызовами compute_energy (хранится не
+        более FFT_PLAN_CACHE планов), окна с весовой функцией
+        записываются сразу во входной массив плана. Иначе
+        используется scipy.fft.
+
+        Parameters
+        ----------
+        windows : ndarray[dtype: float64 | float32, dim = 3]
+            Окна сейсмограммы.
+            [window_axis, tempor_axis, spatial_axis]
+
+        taper : ndarray[dtype: float32, dim = 1]
+            Весовая функция окна.
+
+        n_threads : int
+            Количество потоков преобразования.
+
+        Returns
+        -------
+        spectra : ndarray[dtype: complex128 | complex64, dim = 3]
+            Спектры окон, при использовании pyfftw - выходной массив
+            плана, перезаписываемый следующим вызовом.
+            [window_axis, freq_axis, spatial_axis]
+
+        """
+        if fftw_rfft is None:
+            return fft.rfft(windows * taper[:, np.newaxis], axis=1,
+                            overwrite_x=True, workers=n_threads)
+
+        dtype = np.result_type(windows, taper)
+        key = (windows.shape, dtype, n_threads)
+        plan = self._fft_plans.get(key)
+        if plan is None:
+            if len(self._fft_plans) >= FFT_PLAN_CACHE:
+                self._fft_plans = {}
+            plan = fftw_rfft(np.empty(windows.shape, dtype=dtype),
+                             axis=1, threads=n_threads,
+                             planner_effort='FFTW_MEASURE')
+            self._fft_plans[key] = plan
+
+        np.multiply(windows, taper[:, np.newaxis], out=plan.input_array)
+
+        return plan()
+
+
+    def _get_steering(self, position_rec_x, position_rec_y):
+        """
+        Возвращает фазовые множители приёмников.
+
+        Множители вычисляются один раз для набора частот, скоростей,
+        азимутов и координат приёмников и переиспользуются, пока эти
+        параметры не изменятся.
+
+        Parameters
+        ----------
+        position_rec_x : ndarray[dtype: float64, dim = 1]
+            Координаты приёмников относительно оси X.
+
+        position_rec_y : ndarray[dtype: float64, dim = 1]
+            Координаты приёмников относительно оси Y.
+
+        Returns
+        -------
+        steering : ndarray[dtype: float32, dim = 5]
+            Действительная и мнимая части фазовых множителей
+            приёмников.
+            [re_im_axis, freq_axis, vel_axis, azi_axis, spatial_axis]
+
+        """
+        if (self._steering is not None
+                and np.array_equal(position_rec_x, self._steering_x)
+                and np.array_equal(position_rec_y, self._steering_y)):
+            return self._steering
+
+        self._steering = steering_factors(
+            self._freqs, self._velocities, self._thetas,
+            np.ascontiguousarray(position_rec_x, dtype=np.float64),
+            np.ascontiguousarray(position_rec_y, dtype=np.float64))
+        self._steering_x = np.array(position_rec_x, copy=True)
+        self._steering_y = np.array(position_rec_y, copy=True)
+        self._steering_device = None
+
+        return self._steering
+
+
+    def _dft_spectra(self, windows, taper, xp):
+        """
+        Вычисляет спектры окон точно на частотах freqs.
+
+        Используется, когда частоты не совпадают с отсчётами rfft
+        окна: спектры всех окон вычисляются одним умножением матрицы
+        дискретного преобразования Фурье на окна с весовой функцией.
+
+        Parameters
+        ----------
+        windows : ndarray[dtype: float64 | float32, dim = 3]
+            Окна сейсмограммы, массив numpy или cupy.
+            [window_axis, tempor_axis, spatial_axis]
+
+        taper : ndarray[dtype: float32, dim = 1]
+            Весовая функция окна.
+
+        xp : module
+            Модуль массивов windows (numpy или cupy).
+
+        Returns
+        -------
+        spectra : ndarray[dtype: complex128 | complex64, dim = 3]
+            Спектры окон на частотах freqs.
+            [window_axis, freq_axis, spatial_axis]
+
+        """
+        tapered = windows * taper[:, np.newaxis]
+        times = xp.arange(self._nt) * self._dt
+        dft = xp.exp(-2j * PI * xp.asarray(self._freqs)[:, np.newaxis] *
+                     times)
+
+        return xp.matmul(dft.astype(xp.result_type(tapered, xp.complex64)),
+                         tapered)
+
+
+    def _window_spectra(self, windows, taper, xp, xfft, n_threads):
+        """
+        Вычисляет спектры порции окон на частотах freqs.
+
+        Спектры порции вычисляются одним вызовом rfft, сохраняются
+        только отсчёты спектра на заданных частотах; частоты вне
+        отсчётов rfft требуют точного вычисления спектров на этих
+        частотах.
+
+        Parameters
+        ----------
+        windows : ndarray[dtype: float64 | float32, dim = 3]
+            Окна сейсмограммы, массив numpy или cupy.
+            [window_axis, tempor_axis, spatial_axis]
+
+        taper : ndarray[dtype: float32, dim = 1]
+            Весовая функция окна.
+
+        xp : module
+            Модуль массивов windows (numpy или cupy).
+
+        xfft : module
+            Модуль быстрого преобразования Фурье.
+
+        n_threads : int
+            Количество потоков преобразования на CPU.
+
+        Returns
+        -------
+        spectra : ndarray[dtype: float32, dim = 4]
+            Действительная и мнимая части спектров окон.
+            [re_im_axis, freq_axis, spatial_axis, window_axis]
+
+        """
+        if self._freq_bin_idx is None:
+            spectra = self._dft_spectra(windows, taper, xp)
+        else:
+            if xp is np:
+                spectra = self._rfft(windows, taper, n_threads)
+            else:
+                spectra = xfft.rfft(windows * taper[:, np.newaxis], axis=1,
+                                    overwrite_x=True)
+            spectra = spectra[:, xp.asarray(self._freq_bin_idx), :]
+
+        spectra = spectra.transpose(1, 2, 0)
+
+        return xp.stack((spectra.real, spectra.imag)).astype(xp.float32)
+
+
+    def _compute_energy_batch(self, seismogram, nt_step,
+                              position_rec_x, position_rec_y, n_threads=1):
+        """
+        Вычисляет энергию пакетно для всех окон сейсмограммы.
+
+        На CPU спектры вычисляются порциями по window_block окон на
+        поток, поэтому дополнительная память не зависит от длины
+        записи. При вычислении на GPU сейсмограмма и фазовые
+        множители передаются на устройство один раз, спектры всех
+        окон вычисляются сразу, обратно копируется только итоговая
+        энергия.
+
+        Parameters
+        ----------
+        seismogram : ndarray[dtype: float64 | float32, dim = 2]
+            Массив сейсмической записи.
+            [tempor_axis, spatial_axis]
+
+        nt_step : int
+            Шаг окон по времени в отсчётах.
+
+        position_rec_x : ndarray[dtype: float64, dim = 1]
+            Координаты приёмников относительно оси X.
+
+        position_rec_y : ndarray[dtype: float64, dim = 1]
+            Координаты приёмников относительно оси Y.
+
+        n_threads : int, default = 1
+            Количество потоков обработки окон на CPU.
+
+        Returns
+        -------
+        energy : ndarray[dtype: float64, dim = 3]
+            Энергия для всех частот, скоростей, азимутов.
+            [freq_axis, vel_axis, azi_axis]
+
+        """
+        xp, xfft = get_array_module(self._backend)
+        steering = self._get_steering(position_rec_x, position_rec_y)
+        if xp is not np:
+            if self._steering_device is None:
+                self._steering_device = xp.asarray(steering)
+            steering = self._steering_device
+
+        windows = self._window_view(xp.asarray(seismogram), nt_step, xp)
+        taper = xp.hanning(self._nt).astype(xp.float32)
+        n_win = windows.shape[0]
+
+        energy = xp.zeros((self._freqs.size,
+                           self._velocities.size,
+                           self._thetas.size))
+
+        # на CPU спектры вычисляются порциями по block окон на поток:
+        # лучи блока окон остаются в кэше, в памяти хранятся спектры
+        # только одной порции; на GPU все окна обрабатываются сразу
+        if xp is np:
+            block = window_block(self._velocities.size * self._thetas.size)
+            chunk = block * n_threads
+        else:
+            block = None
+            n_threads = 1
+            chunk = max(n_win, 1)
+
+        for w_0 in range(0, n_win, chunk):
+            spectra = self._window_spectra(windows[w_0 : w_0 + chunk],
+                                           taper, xp, xfft, n_threads)
+            compute_energy_spectrum_(spectra, steering, out=energy,
+                                     block=block, xp=xp,
+                                     n_threads=n_threads)
+
+        return energy if xp is np else energy.get()
+
+
+    def compute_energy(self, data, recievers, n_threads=1):
         """
         Вычисляет энергии для всех скоростей, частот, азимутов.
 
@@ -777,7 +1262,23 @@ class PMASW:
             Экземпляр класса Recievers, который несёт в себе
             информацию о приёмниках.
 
+        n_threads : int, default = 1
+            Количество потоков обработки окон при backend='numpy'.
+            Каждый поток хранит собственный массив энергии
+            [freq_axis, vel_axis, azi_axis] в float64, поэтому
+            дополнительная память растёт пропорционально n_threads.
+            Умножение матриц и так выполняется многопоточным BLAS.
+
         """
+        self._update_grids()
+
+        if not isinstance(n_threads, int):
+            raise ValueError("Количество потоков должно быть целым числом")
+
+        if n_threads <= 0:
+            raise ValueError("Количество потоков должно быть"
+                             " положительным числом")
+
         seismogram = data.seismogram
         data_length = data.nt
         data_num_rec = data.nx
@@ -788,22 +1289,45 @@ class PMASW:
             raise ValueError("Количество трасс в сейсмограмме должно "
                              "быть равным количеству приёмников")
 
-        energy = np.zeros((self._velocities.size,
-                           self._freqs.size,
-                           self._thetas.size))
+        if data_length < self._nt:
+            raise ValueError("Количество отсчётов в сейсмограмме должно "
+                             "быть не меньше количества обрабатываемых "
+                             "отсчётов")
 
         nt_step = self._nt - int(self._nt * self._overlap / 100)
+
+        if self._backend != 'native':
+            self._energy = self._compute_energy_batch(seismogram, nt_step,
+                                                      position_rec_x,
+                                                      position_rec_y,
+                                                      n_threads)
+            self._energy_version += 1
+            return
+
+        energy = np.zeros((self._freqs.size,
+                           self._velocities.size,
+                           self._thetas.size))
         self._create_window(position_rec_x)
 
-        for i_start in trange(0, data_length + nt_step - self._nt, nt_step):
-            seismogram_window = seismogram[i_start : i_start + self._nt, :] * \
-                    self._window
+        # буфер окна выделяется один раз
+        seismogram_window = np.empty_like(self._window)
 
-            energy += np.abs(compute_energy_(seismogram_window, self._freqs,
-                                           self._velocities, self._thetas,
-                                           position_rec_x, position_rec_y))
+        windows = self._window_view(seismogram, nt_step)
+        for i_win in trange(len(windows)):
+            np.multiply(windows[i_win], self._window, out=seismogram_window)
+
+            # модуль лучей в порядке осей расширения [vel, freq, azi]
+            # прибавляется к энергии [freq, vel, azi] за один проход
+            accumulate_modulus(energy,
+                               compute_energy_(seismogram_window,
+                                               self._freqs,
+                                               self._velocities,
+                                               self._thetas,
+                                               position_rec_x,
+                                               position_rec_y))
 
         self._energy = energy
+        self._energy_version += 1
 
 
     @property
@@ -812,7 +1336,8 @@ class PMASW:
         Возвращает зависимость энергии от скоростей и частот.
 
         Суммирование энергии по всем азуимутам и возвращение зависимости
-        энергии от скоростей и частот.
+        энергии от скоростей и частот. Сумма вычисляется один раз
+        после каждого вызова compute_energy.
 
         Returns
         -------
@@ -821,10 +1346,12 @@ class PMASW:
             [vel_axis, freq_axis]
 
         """
-        if len(self._energy.shape) == 0:
+        if self._energy_version == 0:
             raise ValueError("Энергия не была посчитана")
 
-        self._en_vel_freq = np.sum(self._energy, axis=2)
+        if self._vf_version != self._energy_version:
+            self._en_vel_freq = np.sum(self._energy, axis=2).T
+            self._vf_version = self._energy_version
 
         return self._en_vel_freq
 
@@ -835,7 +1362,8 @@ class PMASW:
         Возвращает зависимость энергии от частот и азимутов.
 
         Суммирование энергии по всем скоростям и возвращение
-        зависимости от частот и азимутов.
+        зависимости от частот и азимутов. Сумма вычисляется один раз
+        после каждого вызова compute_energy.
 
         Returns
         -------
@@ -844,8 +1372,11 @@ class PMASW:
             [freq_axis, azi_axis]
 
         """
-        if len(self._energy.shape) == 0:
+        if self._energy_version == 0:
             raise ValueError("Энергия не была посчитана")
 
-        self._en_f_theta = np.sum(self._energy, axis=0)
+        if self._f_theta_version != self._energy_version:
+            self._en_f_theta = np.sum(self._energy, axis=1)
+            self._f_theta_version = self._energy_version
+
         return self._en_f_theta
@@ -18,7 +18,7 @@ class PassiveData:
     dt : float
         Время дескретизации сигнала.
 
-    seismogram : ndarray[dtype: float64, dim = 2]
+    seismogram : ndarray[dtype: float64 | float32, dim = 2]
             Массив сейсмичсеской записи.
             [tempor_axis, spatial_axis]
 
@@ -30,7 +30,7 @@ class PassiveData:
 
         Parameters
         ----------
-        data : ndarray[dtype: float64, dim = 2]
+        data : ndarray[dtype: float64 | float32 | int32, dim = 2]
             Массив сейсмичсеской записи.
             [tempor_axis, spatial_axis]
 
@@ -77,7 +77,7 @@ class PassiveData:
             Время дескретизации сигнала.
 
         """
-        if (not isinstance(value, float)) and (not isinstance(value, int)):
+        if not isinstance(value, (int, float)):
             raise ValueError("Время дескретизации должно быть числом")
 
         if value < 0:
@@ -159,7 +159,7 @@ class PassiveData:
 
         Returns
         -------
-        seismogram : ndarray[dtype: float64, dim = 2]
+        seismogram : ndarray[dtype: float64 | float32, dim = 2]
             Массив сейсмичсеской записи.
             [tempor_axis, spatial_axis]
 
@@ -172,9 +172,13 @@ class PassiveData:
         """
         Устанавливает сейсмическую запись.
 
+        Записи типов float64 и float32 сохраняются без копирования,
+        поэтому методы DataPreprocessor изменяют переданный массив
+        на месте. Запись типа int32 приводится к float64.
+
         Parameters
         ----------
-        value : ndarray[dtype: float64 | int32, dim = 2]
+        value : ndarray[dtype: float64 | float32 | int32, dim = 2]
             Массив сейсмичкской записи.
             [tempor_axis, spatial_axis]
 
@@ -183,23 +187,18 @@ class PassiveData:
             raise ValueError("Подаваемый массив должен быть типа"
                              "numpy.ndarray")
 
-        if len(value) == 0:
+        if value.ndim != 2:
+            raise ValueError("Размер массива должен быть равен 2")
+
+        if value.shape[0] == 0 or value.shape[1] == 0:
             raise ValueError("Подаваемый массив не должен быть пустым")
 
-        if (value.dtype != np.int32) and (value.dtype != np.float64):
+        if value.dtype not in (np.int32, np.float32, np.float64):
             raise ValueError("Подаваемый массив должен состоять из типов"
-                             "данных float64 или int32")
-
-        if not isinstance(value[0], np.ndarray):
-            raise ValueError("Подаваемый массив должен состоять из "
-                             "массивов типа numpy.array")
+                             "данных float64, float32 или int32")
 
-        if len(value[0]) == 0:
-            raise ValueError("Подаваемый массив не должен быть пустым")
-
-        if len(value.shape) != 2:
-            raise ValueError("Размер массива должен быть равен 2")
+        if value.dtype == np.int32:
+            value = value.astype(np.float64)
 
-        self._seismogram = np.float64(value)
+        self._seismogram = value
         self._nt, self._nx = value.shape
-
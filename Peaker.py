@@ -5,8 +5,183 @@
 массиву енергии в зависимости от скорости и частоты в некоторых пределах.
 """
 
+from typing import NamedTuple
+
 import numpy as np
-from scipy.interpolate import interp1d
+from numba import njit, prange
+
+from .validation import validate_1d
+
+
+@njit(cache=True)
+def _nearest_index(grid, value, step):
+    """
+    Индекс ближайшего к value узла возрастающей сетки grid.
+
+    Для равномерной сетки соседние узлы определяются по шагу за O(1),
+    иначе бинарным поиском. При равном расстоянии
+    до двух узлов выбирается меньший индекс (как в np.argmin).
+
+    Parameters
+    ----------
+    grid : ndarray[dtype: float64, dim = 1]
+        Возрастающая сетка значений.
+
+    value : float
+        Искомое значение.
+
+    step : float
+        Шаг равномерной сетки, 0 для неравномерной.
+
+    Returns
+    -------
+    index : int
+        Индекс ближайшего узла сетки.
+
+    """
+    if grid.size == 1:
+        return 0
+
+    if step > 0:
+        right = int((value - grid[0]) / step) + 1
+    else:
+        right = np.searchsorted(grid, value)
+
+    right = min(max(right, 1), grid.size - 1)
+    left = right - 1
+    if grid[right] - value < value - grid[left]:
+        return right
+
+    return left
+
+
+@njit(cache=True)
+def _compute_indices(v_p_interp, v_step, velocities, grid_step):
+    """
+    Границы диапазонов скоростей и их индексы за один проход.
+
+    Границы v_p_interp -+ v_step ограничиваются крайними значениями
+    velocities, индексы границ определяются ближайшими узлами
+    velocities.
+
+    Parameters
+    ----------
+    v_p_interp : ndarray[dtype: float64, dim = 1]
+        Интерполированные скорости на частотах пикирования.
+
+    v_step : ndarray[dtype: float64, dim = 1]
+        Полуширина диапазона поиска на частотах пикирования.
+
+    velocities : ndarray[dtype: float64, dim = 1]
+        Возрастающий массив скоростей, соответствующих vf.
+
+    grid_step : float
+        Шаг равномерного массива velocities, 0 для неравномерного.
+
+    Returns
+    -------
+    v_lower : ndarray[dtype: float64, dim = 1]
+        Нижние границы скоростей.
+
+    v_upper : ndarray[dtype: float64, dim = 1]
+        Верхние границы скоростей.
+
+    lower : ndarray[dtype: int64, dim = 1]
+        Индексы нижних границ в velocities.
+
+    upper : ndarray[dtype: int64, dim = 1]
+        Индексы верхних границ в velocities.
+
+    """
+    n_freq = v_p_interp.size
+    v_min, v_max = velocities[0], velocities[-1]
+    v_lower = np.empty(n_freq)
+    v_upper = np.empty(n_freq)
+    lower = np.empty(n_freq, dtype=np.int64)
+    upper = np.empty(n_freq, dtype=np.int64)
+    for f_i in range(n_freq):
+        v_lower[f_i] = min(max(v_p_interp[f_i] - v_step[f_i], v_min), v_max)
+        v_upper[f_i] = min(max(v_p_interp[f_i] + v_step[f_i], v_min), v_max)
+        lower[f_i] = _nearest_index(velocities, v_lower[f_i], grid_step)
+        upper[f_i] = _nearest_index(velocities, v_upper[f_i], grid_step)
+
+    return v_lower, v_upper, lower, upper
+
+
+@njit(parallel=True, nogil=True, cache=True)
+def _peak_kernel(vf_cols, lower, upper):
+    """
+    Индексы максимумов vf в диапазонах скоростей для всех частот.
+
+    Для каждой частоты i максимум ищется по индексам
+    [lower[i], upper[i]) столбца vf_cols[:, i].
+
+    Parameters
+    ----------
+    vf_cols : ndarray[dtype: float64, dim = 2]
+        Столбцы массива vf на частотах пикирования.
+        [vel_axis, freq_axis]
+
+    lower : ndarray[dtype: int64, dim = 1]
+        Индексы нижних границ скоростей.
+
+    upper : ndarray[dtype: int64, dim = 1]
+        Индексы верхних границ скоростей.
+
+    Returns
+    -------
+    ind_max : ndarray[dtype: int64, dim = 1]
+        Индексы скоростей максимумов, -1 для пустого диапазона.
+
+    """
+    n_freq = lower.size
+    ind_max = np.empty(n_freq, dtype=np.int64)
+    for f_i in prange(n_freq):
+        best = lower[f_i]
+        if best >= upper[f_i]:
+            ind_max[f_i] = -1
+            continue
+
+        # первый элемент диапазона задаёт начальный максимум,
+        # во внутреннем цикле остаётся одно сравнение; на широких
+        # диапазонах один проход не медленнее двух (поиск максимума,
+        # затем поиск индекса максимума) и значительно быстрее
+        # маскированного np.maximum.accumulate по всему блоку
+        best_value = vf_cols[best, f_i]
+        for v_i in range(best + 1, upper[f_i]):
+            value = vf_cols[v_i, f_i]
+            if value > best_value:
+                best = v_i
+                best_value = value
+        ind_max[f_i] = best
+
+    return ind_max
+
+
+class PeakResult(NamedTuple):
+    """
+    Результат пикирования дисперсионной кривой.
+
+    Attributes
+    ----------
+    f : ndarray[dtype: float64, dim = 1]
+        Частоты пикирования.
+
+    v_lower : ndarray[dtype: float64, dim = 1]
+        Нижние границы поиска скоростей.
+
+    v_upper : ndarray[dtype: float64, dim = 1]
+        Верхние границы поиска скоростей.
+
+    v_peak : ndarray[dtype: float64, dim = 1]
+        Скорости максимумов энергии.
+
+    """
+
+    f: np.ndarray
+    v_lower: np.ndarray
+    v_upper: np.ndarray
+    v_peak: np.ndarray
 
 
 class Peaker:
@@ -40,9 +215,10 @@ class Peaker:
         self.f_p = f_p
         self.v_step_high_freq = v_step_high_freq
         self.v_step_low_freq = v_step_low_freq
-        self._interpolator = None
+        self._velocities = None
+        self._velocities_step = 0.
 
-        self._interpolation_vf()
+        self._check_knots()
 
 
     @property
@@ -66,29 +242,11 @@ class Peaker:
 
         Parameters
         ----------
-        value : ndarray[dtype: float64 | int32, dim = 1]
+        value : ndarray[dtype: float | int, dim = 1]
             Массив фазовых скоростей.
 
         """
-        if not isinstance(value, np.ndarray):
-            raise ValueError("Подаваемый массив должен быть типа"
-                             "numpy.ndarray")
-
-        if len(value) == 0:
-            raise ValueError("Подаваемый массив не должен быть пустым")
-
-        if (value.dtype != np.int32) and (value.dtype != np.float64):
-            raise ValueError("Подаваемый массив должен состоять из типов"
-                             "данных float64 или int32")
-
-        if any(value <= 0):
-            raise ValueError("Подаваемый массив должен состоять из "
-                             "положительных чисел")
-
-        if len(value.shape) != 1:
-            raise ValueError("Размер массива должен быть равен 1")
-
-        self._v_p = value
+        self._v_p = validate_1d(value)
 
 
     @property
@@ -196,30 +354,18 @@ class Peaker:
 
         Parameters
         ----------
-        value : ndarray[dtype: float64 | int32, dim = 1]
-            Массив частот.
+        value : ndarray[dtype: float | int, dim = 1]
+            Строго возрастающий массив частот.
 
         """
-        if not isinstance(value, np.ndarray):
-            raise ValueError("Подаваемый массив должен быть типа"
-                             "numpy.ndarray")
-
-        if len(value) == 0:
-            raise ValueError("Подаваемый массив не должен быть пустым")
-
-        if (value.dtype != np.int32) and (value.dtype != np.float64):
-            raise ValueError("Подаваемый массив должен состоять из типов"
-                             "данных float64 или int32")
-
-        if any(value <= 0):
-            raise ValueError("Подаваемый массив должен состоять из "
-                             "положительных чисел")
-
-        if len(value.shape) != 1:
-            raise ValueError("Размер массива должен быть равен 1")
-
+        value = validate_1d(value, increasing=True)
         self._f_p = value
 
+        # границы частот пикирования вычисляются один раз при установке
+        # и используются peak_dispersuon_curve при каждом вызове
+        self._f_min = value[0]
+        self._f_max = value[-1]
+
 
     @property
     def f_p_interp(self):
@@ -235,12 +381,47 @@ class Peaker:
         return self._f_p_interp
 
 
-    def _interpolation_vf(self):
-        """Создание интерполятора."""
-        self._interpolator = interp1d(self._f_p, self._v_p)
+    def _check_knots(self):
+        """Проверка совпадения длин массивов v_p и f_p."""
+        if self._v_p.size != self._f_p.size:
+            raise ValueError("Массивы v_p и f_p должны быть одинаковой"
+                             " длины")
+
+
+    def _grid_step(self, velocities):
+        """
+        Шаг равномерного массива скоростей.
+
+        Равномерность проверяется один раз для каждого массива
+        velocities, результат сохраняется до передачи другого массива.
+
+        Parameters
+        ----------
+        velocities : ndarray[dtype : float64, dim=1]
+            Возрастающий массив скоростей.
+
+        Returns
+        -------
+        step : float
+            Шаг массива скоростей, 0 для неравномерного массива.
+
+        """
+        if velocities is not self._velocities:
+            step = 0.
+            if velocities.size > 1:
+                step = (velocities[-1] - velocities[0]) / \
+                       (velocities.size - 1)
+                if not np.allclose(np.diff(velocities), step,
+                                   rtol=1e-9, atol=0):
+                    step = 0.
 
+            self._velocities = velocities
+            self._velocities_step = step
 
-    def peak_dispersuon_curve(self, vf, velocities, freqs):
+        return self._velocities_step
+
+
+    def peak_dispersuon_curve(self, vf, velocities, freqs, dtype=None):
         """
         Определение максимум амплитуды массива vf вдоль оси freq.
 
@@ -254,54 +435,64 @@ class Peaker:
             [vel_axis, freq_axis]
 
         velocities : ndarray[dtype : float64, dim=1]
-            Массив скоростей соответствующих скоростоям в vf.
+            Возрастающий массив скоростей соответствующих скоростоям в vf.
 
         freqs: ndarray[dtype : float64, dim=1]
-            Массив частот соответствующих частотам в vf.
-
-        """
-        # Выбираем частоты в указанном диапазоне
-        self._f_p_interp = freqs[(self._f_p.min() <= freqs) * \
-                                 (freqs <= self._f_p.max())]
+            Возрастающий массив частот соответствующих частотам в vf.
 
-        # Интерполятор диапазона скоростей
-        self._interpolator_v_step = interp1d(self._f_p[[0, -1]],
-                                             [self._v_step_low_freq,
-                                              self._v_step_high_freq])
+        dtype : numpy.dtype | None, default = None
+            Тип данных, в котором ищутся максимумы. При np.float32
+            объём читаемой памяти уменьшается вдвое, при None
+            используется тип vf.
 
-        # Интерполируем скорости
-        self._v_p_interp = self._interpolator(self._f_p_interp)
-
-        # Интерполируем диапазон скоростей
-        self._v_step = self._interpolator_v_step(self._f_p_interp)
-
-        # Определяем верхнюю границу скоростей
-        v_p_interp_upper = np.clip(self._v_p_interp + self._v_step,
-                                   a_max=velocities.max(),
-                                   a_min=velocities.min())
-
-        # Определяем нижнюю границу скоростей
-        v_p_interp_lower = np.clip(self._v_p_interp - self._v_step,
-                                   a_max=velocities.max(),
-                                   a_min=velocities.min())
-
-        # Орпеделяем индексы верхней границы скоростей
-        upper_indexes = np.argmin(np.abs(velocities - \
-                            v_p_interp_upper[np.newaxis].T),
-                                  axis=1)
+        Returns
+        -------
+        result : PeakResult
+            Частоты пикирования, границы поиска скоростей и скорости
+            максимумов энергии.
 
-        # Определяем индексы нижней границы скоростей
-        lower_indexes = np.argmin(np.abs(velocities - \
-                            v_p_interp_lower[np.newaxis].T),
-                                  axis=1)
+        """
+        self._check_knots()
 
-        f_0 = np.where(freqs == self._f_p_interp[0])[0][0]
+        if freqs[0] > freqs[-1] or velocities[0] > velocities[-1]:
+            raise ValueError("Массивы частот и скоростей должны быть"
+                             " возрастающими")
 
-        ind_max = np.array([np.argmax(vf[lower_indexes[f_i] :\
-                                         upper_indexes[f_i], f_0 + f_i]) + \
-                lower_indexes[f_i] for f_i in range(len(self._f_p_interp))])
+        # Выбираем частоты в указанном диапазоне бинарным поиском
+        # по возрастающему массиву freqs
+        f_lo = np.searchsorted(freqs, self._f_min, side='left')
+        f_hi = np.searchsorted(freqs, self._f_max, side='right')
+        self._f_p_interp = freqs[f_lo:f_hi]
 
-        return (self._f_p_interp,
-               v_p_interp_lower,
-               v_p_interp_upper,
-               velocities[ind_max])
+        # Интерполируем скорости
+        self._v_p_interp = np.interp(self._f_p_interp, self._f_p, self._v_p)
+
+        # Диапазон скоростей линейно меняется между крайними частотами,
+        # интерполятор по двум точкам не строится
+        self._v_step = np.interp(self._f_p_interp,
+                                 (self._f_min, self._f_max),
+                                 (self._v_step_low_freq,
+                                  self._v_step_high_freq))
+
+        # Границы скоростей, ограниченные массивом velocities,
+        # и их индексы вычисляются за один проход
+        v_p_interp_lower, v_p_interp_upper, lower, upper = \
+            _compute_indices(self._v_p_interp, self._v_step, velocities,
+                             self._grid_step(velocities))
+
+        # Столбцы частот пикирования хранятся непрерывно (порядок
+        # Fortran), vf из PMASW уже имеет такой порядок и без смены
+        # типа не копируется
+        vf_cols = np.asfortranarray(vf[:, f_lo:f_hi], dtype=dtype)
+
+        # Максимумы для всех частот
+        ind_max = _peak_kernel(vf_cols, lower, upper)
+
+        if np.any(ind_max < 0):
+            raise ValueError("Диапазон поиска скоростей не должен быть"
+                             " пустым")
+
+        return PeakResult(self._f_p_interp,
+                          v_p_interp_lower,
+                          v_p_interp_upper,
+                          velocities[ind_max])
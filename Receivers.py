@@ -3,6 +3,8 @@
 
 import numpy as np
 
+from .validation import validate_1d
+
 
 class Receivers:
     """
@@ -61,25 +63,12 @@ class Receivers:
 
         Parameters
         ----------
-        value : ndarray[dtype: float64 | int32, dim = 1]
+        value : ndarray[dtype: float | int, dim = 1]
             Координаты приёмников относительно оси X в м.
 
         """
-        if not isinstance(value, np.ndarray):
-            raise ValueError("Подаваемый массив должен быть типа"
-                             "numpy.ndarray")
-
-        if len(value) == 0:
-            raise ValueError("Подаваемый массив не должен быть пустым")
-
-        if (value.dtype != np.int32) and (value.dtype != np.float64):
-            raise ValueError("Подаваемый массив должен состоять из типов"
-                             "данных float64 или int32")
-
-        if len(value.shape) != 1:
-            raise ValueError("Размер массива должен быть равен 1")
-
-        self._x = np.float64(value)
+        self._x = np.ascontiguousarray(
+            validate_1d(value, positive=False), dtype=np.float64)
 
 
     @property
@@ -103,22 +92,9 @@ class Receivers:
 
         Parameters
         ----------
-        value : ndarray[dtype: float64 | int32, dim = 1]
+        value : ndarray[dtype: float | int, dim = 1]
             Координаты приёмников относительно оси Y в м.
 
         """
-        if not isinstance(value, np.ndarray):
-            raise ValueError("Подаваемый массив должен быть типа"
-                             "numpy.ndarray")
-
-        if len(value) == 0:
-            raise ValueError("Подаваемый массив не должен быть пустым")
-
-        if (value.dtype != np.int32) and (value.dtype != np.float64):
-            raise ValueError("Подаваемый массив должен состоять из типов"
-                             "данных float64 или int32")
-
-        if len(value.shape) != 1:
-            raise ValueError("Размер массива должен быть равен 1")
-
-        self._y = np.float64(value)
+        self._y = np.ascontiguousarray(
+            validate_1d(value, positive=False), dtype=np.float64)
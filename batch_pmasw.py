@@ -0,0 +1,302 @@
+"""
+Модуль пакетного вычисления энергии методом PMASW.
+
+Спектры всех окон сейсмограммы обрабатываются одним вызовом
+средствами numpy или cupy (на GPU), суммирование по окнам
+выполняется внутри вызова.
+"""
+
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from numba import njit, prange
+from scipy import fft
+
+from .fast_preprocessing import block_size
+
+try:
+    from pyfftw.builders import rfft as fftw_rfft
+except ImportError:
+    fftw_rfft = None
+
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:
+    threadpool_limits = None
+
+MIN_WINDOW_BLOCK = 128
+PI = 3.1415926535897932384626433832
+
+
+def get_array_module(backend):
+    """
+    Возвращает модули массивов и быстрого преобразования Фурье.
+
+    Пакет cupy импортируется только при выборе вычисления на GPU.
+
+    Parameters
+    ----------
+    backend : str
+        Способ вычисления энергии, 'numpy' или 'cuda'.
+
+    Returns
+    -------
+    xp : module
+        Модуль массивов (numpy или cupy).
+
+    xfft : module
+        Модуль быстрого преобразования Фурье.
+
+    """
+    if backend == 'cuda':
+        try:
+            import cupy
+            from cupyx.scipy import fft as cufft
+        except ImportError as err:
+            raise ValueError("Для вычисления на GPU необходим"
+                             " пакет cupy") from err
+
+        return cupy, cufft
+
+    return np, fft
+
+
+@njit(parallel=True, cache=True)
+def steering_factors(freqs, velocities, thetas, x, y):
+    """
+    Вычисляет фазовые множители приёмников.
+
+    Множитель для частоты f, скорости v, азимута theta и приёмника
+    равен exp(j * 2 * pi * f / v * (x * cos(theta) + y * sin(theta))).
+    Фаза вычисляется в float64 для каждого элемента отдельно,
+    в память записываются только части множителей в float32.
+
+    Parameters
+    ----------
+    freqs : ndarray[dtype: float64, dim = 1]
+        Массив частот в Гц.
+
+    velocities : ndarray[dtype: float64, dim = 1]
+        Массив фазовых скоростей.
+
+    thetas : ndarray[dtype: float64, dim = 1]
+        Массив азимутов в радианах.
+
+    x : ndarray[dtype: float64, dim = 1]
+        Координаты приёмников относительно оси X.
+
+    y : ndarray[dtype: float64, dim = 1]
+        Координаты приёмников относительно оси Y.
+
+    Returns
+    -------
+    steering : ndarray[dtype: float32, dim = 5]
+        Действительная и мнимая части фазовых множителей
+        приёмников.
+        [re_im_axis, freq_axis, vel_axis, azi_axis, spatial_axis]
+
+    """
+    n_freq, n_vel = freqs.size, velocities.size
+    n_theta, n_rec = thetas.size, x.size
+
+    # проекции координат приёмников на направления азимутов
+    offsets = np.empty((n_theta, n_rec))
+    for i_theta in range(n_theta):
+        cos_theta = np.cos(thetas[i_theta])
+        sin_theta = np.sin(thetas[i_theta])
+        for i_rec in range(n_rec):
+            offsets[i_theta, i_rec] = x[i_rec] * cos_theta + \
+                                      y[i_rec] * sin_theta
+
+    steering = np.empty((2, n_freq, n_vel, n_theta, n_rec),
+                        dtype=np.float32)
+    for i_freq in prange(n_freq):
+        for i_vel in range(n_vel):
+            wavenumber = 2 * PI * freqs[i_freq] / velocities[i_vel]
+            for i_theta in range(n_theta):
+                for i_rec in range(n_rec):
+                    phase = wavenumber * offsets[i_theta, i_rec]
+                    steering[0, i_freq, i_vel, i_theta, i_rec] = np.cos(phase)
+                    steering[1, i_freq, i_vel, i_theta, i_rec] = np.sin(phase)
+
+    return steering
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def accumulate_modulus(energy, beams):
+    """
+    Прибавляет модуль комплексных лучей к энергии за один проход.
+
+    Parameters
+    ----------
+    energy : ndarray[dtype: float64, dim = 3]
+        Массив, в который накапливается энергия.
+        [freq_axis, vel_axis, azi_axis]
+
+    beams : ndarray[dtype: complex128, dim = 3]
+        Лучи одного окна.
+        [vel_axis, freq_axis, azi_axis]
+
+    """
+    n_freq, n_vel, n_theta = energy.shape
+    for i_freq in prange(n_freq):
+        for i_vel in range(n_vel):
+            for i_theta in range(n_theta):
+                beam = beams[i_vel, i_freq, i_theta]
+                energy[i_freq, i_vel, i_theta] += np.sqrt(
+                    beam.real * beam.real + beam.imag * beam.imag)
+
+
+def window_block(n_beams):
+    """
+    Количество окон в блоке умножения матриц.
+
+    Лучи блока окон (действительная и мнимая части в float32) должны
+    помещаться в кэш L2, но блок не уже MIN_WINDOW_BLOCK окон, чтобы
+    умножение матриц оставалось эффективным.
+
+    Parameters
+    ----------
+    n_beams : int
+        Количество пар скорость-азимут.
+
+    Returns
+    -------
+    block : int
+        Количество окон в блоке.
+
+    """
+    return max(MIN_WINDOW_BLOCK,
+               block_size(n_beams, np.dtype(np.float32).itemsize))
+
+
+def _beamform_windows(spectra, steering, out, block, xp):
+    """
+    Накапливает энергию для последовательности окон.
+
+    Parameters
+    ----------
+    spectra : ndarray[dtype: float32, dim = 4]
+        Действительная и мнимая части спектров окон.
+        [re_im_axis, freq_axis, spatial_axis, window_axis]
+
+    steering : ndarray[dtype: float32, dim = 5]
+        Действительная и мнимая части фазовых множителей.
+        [re_im_axis, freq_axis, vel_axis, azi_axis, spatial_axis]
+
+    out : ndarray[dtype: float64, dim = 3]
+        Массив, в который накапливается энергия.
+        [freq_axis, vel_axis, azi_axis]
+
+    block : int | None
+        Количество окон, обрабатываемых за одно умножение.
+
+    xp : module
+        Модуль массивов spectra и steering (numpy или cupy).
+
+    """
+    _, n_freq, n_vel, n_theta, n_rec = steering.shape
+    steering_re, steering_im = steering.reshape(2, n_freq, n_vel * n_theta,
+                                                n_rec)
+    spectra_re, spectra_im = spectra
+    n_win = spectra.shape[3]
+    if block is None:
+        block = max(n_win, 1)
+
+    # лучи [vel * azi, window] записываются в буферы, которые
+    # выделяются один раз (и ещё раз для неполного последнего блока)
+    buffers = xp.empty((3, n_vel * n_theta, block), dtype=xp.float32)
+
+    # лучи блока окон остаются в кэше между умножением матриц
+    # и суммированием их модулей
+    for w_0 in range(0, n_win, block):
+        s_re = spectra_re[:, :, w_0 : w_0 + block]
+        s_im = spectra_im[:, :, w_0 : w_0 + block]
+        if s_re.shape[2] != buffers.shape[2]:
+            buffers = xp.empty((3, n_vel * n_theta, s_re.shape[2]),
+                               dtype=xp.float32)
+        beams_re, beams_im, tmp = buffers
+
+        for i_freq in range(n_freq):
+            w_re = steering_re[i_freq]
+            w_im = steering_im[i_freq]
+            xp.matmul(w_re, s_re[i_freq], out=beams_re)
+            beams_re -= xp.matmul(w_im, s_im[i_freq], out=tmp)
+            xp.matmul(w_re, s_im[i_freq], out=beams_im)
+            beams_im += xp.matmul(w_im, s_re[i_freq], out=tmp)
+
+            beams = xp.hypot(beams_re, beams_im, out=beams_re)
+            out[i_freq] += beams.sum(axis=1, dtype=xp.float64).reshape(
+                n_vel, n_theta)
+
+
+def compute_energy_spectrum_(spectra, steering, out, block=None, xp=np,
+                             n_threads=1):
+    """
+    Вычисляет энергию по спектрам всех окон сейсмограммы.
+
+    Энергия для скорости v, частоты f и азимута theta равна сумме
+    по окнам модуля скалярного произведения спектров трасс на
+    вектор фазовых множителей этой тройки параметров. Для каждой
+    частоты скалярные произведения всех пар скорость-азимут с блоком
+    окон вычисляются четырьмя умножениями вещественных матриц
+    float32 (BLAS) над действительными и мнимыми частями. Лучи
+    записываются в буферы, выделяемые один раз на вызов.
+
+    Окна не зависят друг от друга, поэтому при n_threads > 1 они
+    делятся на непрерывные части, которые обрабатываются в отдельных
+    потоках со своими накопителями энергии (numpy освобождает GIL
+    при умножении матриц). Каждый поток выделяет собственный массив
+    энергии размером out в float64. Чтобы потоки не конкурировали
+    с многопоточным BLAS за ядра, на время их работы BLAS
+    ограничивается одним потоком (при установленном threadpoolctl).
+
+    Parameters
+    ----------
+    spectra : ndarray[dtype: float32, dim = 4]
+        Действительная и мнимая части спектров окон сейсмограммы
+        на частотах freqs, массив numpy или cupy.
+        [re_im_axis, freq_axis, spatial_axis, window_axis]
+
+    steering : ndarray[dtype: float32, dim = 5]
+        Действительная и мнимая части фазовых множителей
+        приёмников, массив того же модуля, что и spectra.
+        [re_im_axis, freq_axis, vel_axis, azi_axis, spatial_axis]
+
+    out : ndarray[dtype: float64, dim = 3]
+        Массив, в который накапливается энергия.
+        [freq_axis, vel_axis, azi_axis]
+
+    block : int | None, default = None
+        Количество окон, обрабатываемых за одно умножение. При None
+        все окна обрабатываются сразу.
+
+    xp : module, default = numpy
+        Модуль массивов spectra и steering (numpy или cupy).
+
+    n_threads : int, default = 1
+        Количество потоков обработки окон.
+
+    """
+    n_win = spectra.shape[3]
+    n_threads = max(1, min(n_threads, n_win))
+    if n_threads == 1:
+        _beamform_windows(spectra, steering, out, block, xp)
+        return
+
+    bounds = np.linspace(0, n_win, n_threads + 1).astype(np.int64)
+    partial = xp.zeros((n_threads, *out.shape))
+
+    def beamform_part(i_part):
+        _beamform_windows(spectra[..., bounds[i_part] : bounds[i_part + 1]],
+                          steering, partial[i_part], block, xp)
+
+    if threadpool_limits is not None and xp is np:
+        with threadpool_limits(limits=1, user_api='blas'), \
+                ThreadPoolExecutor(n_threads) as pool:
+            list(pool.map(beamform_part, range(n_threads)))
+    else:
+        with ThreadPoolExecutor(n_threads) as pool:
+            list(pool.map(beamform_part, range(n_threads)))
+
+    out += partial.sum(axis=0)
@@ -0,0 +1,315 @@
+"""
+Модуль быстрых ядер предобработки данных.
+
+Ядра компилируются с помощью numba и используются
+классом DataPreprocessor.
+"""
+
+import numpy as np
+from numba import config, get_num_threads, njit, prange, set_num_threads
+from scipy.signal import sosfilt_zi
+
+L2_CACHE = 256 * 1024
+CACHE_LINE = 64
+
+
+def block_size(nt, itemsize, cache=L2_CACHE):
+    """
+    Количество трасс в блоке, помещающемся в кэш.
+
+    Блок из входных и выходных отсчётов должен помещаться в кэш,
+    но содержит не меньше трасс, чем умещается в одной строке кэша.
+
+    Parameters
+    ----------
+    nt : int
+        Количество отсчётов по времени.
+
+    itemsize : int
+        Размер отсчёта в байтах.
+
+    cache : int, default = L2_CACHE
+        Размер кэша в байтах.
+
+    Returns
+    -------
+    block : int
+        Количество трасс в блоке.
+
+    """
+    return max(CACHE_LINE // itemsize, cache // (2 * nt * itemsize))
+
+
+@njit(cache=True)
+def _odd_extend(x, c0, padlen, ext):
+    """
+    Нечётное продолжение блока трасс на краях.
+
+    Parameters
+    ----------
+    x : ndarray[dtype: float64 | float32, dim = 2]
+        Массив сейсмической записи.
+        [tempor_axis, spatial_axis]
+
+    c0 : int
+        Индекс первой трассы блока.
+
+    padlen : int
+        Количество отсчётов продолжения на каждом краю.
+
+    ext : ndarray[dtype: float64, dim = 2]
+        Массив для записи продолженного блока.
+        [tempor_axis, spatial_axis]
+
+    """
+    nt = x.shape[0]
+    n_ext, nb = ext.shape
+    for i in range(padlen):
+        for k in range(nb):
+            ext[i, k] = 2 * x[0, c0 + k] - x[padlen - i, c0 + k]
+    for i in range(nt):
+        for k in range(nb):
+            ext[padlen + i, k] = x[i, c0 + k]
+    for i in range(padlen):
+        for k in range(nb):
+            ext[n_ext - 1 - i, k] = 2 * x[nt - 1, c0 + k] - \
+                                    x[nt - 1 - padlen + i, c0 + k]
+
+
+@njit(fastmath=True, cache=True)
+def _sos_pass(sos, zi, ext, start, stop, step, z):
+    """
+    Проход каскада секций второго порядка по блоку трасс на месте.
+
+    Parameters
+    ----------
+    sos : ndarray[dtype: float64, dim = 2]
+        Коэффициенты секций фильтра.
+        [n_sections, 6]
+
+    zi : ndarray[dtype: float64, dim = 2]
+        Начальные состояния секций для единичного скачка.
+        [n_sections, 2]
+
+    ext : ndarray[dtype: float64, dim = 2]
+        Фильтруемый блок трасс.
+        [tempor_axis, spatial_axis]
+
+    start, stop, step : int
+        Диапазон отсчётов прохода.
+
+    z : ndarray[dtype: float64, dim = 3]
+        Массив состояний секций.
+        [n_sections, 2, spatial_axis]
+
+    """
+    n_sections = sos.shape[0]
+    nb = ext.shape[1]
+    for s in range(n_sections):
+        for k in range(nb):
+            z[s, 0, k] = zi[s, 0] * ext[start, k]
+            z[s, 1, k] = zi[s, 1] * ext[start, k]
+
+    for i in range(start, stop, step):
+        for s in range(n_sections):
+            # трассы блока не зависят друг от друга, внутренний цикл
+            # по трассам векторизуется
+            for k in range(nb):
+                xn = ext[i, k]
+                yn = sos[s, 0] * xn + z[s, 0, k]
+                z[s, 0, k] = sos[s, 1] * xn - sos[s, 4] * yn + z[s, 1, k]
+                z[s, 1, k] = sos[s, 2] * xn - sos[s, 5] * yn
+                ext[i, k] = yn
+
+
+@njit(fastmath=True, cache=True)
+def _sos_pass_decim(sos, zi, ext, padlen, resamp, z, out, c0):
+    """
+    Обратный проход каскада с записью только сохраняемых отсчётов.
+
+    Parameters
+    ----------
+    sos : ndarray[dtype: float64, dim = 2]
+        Коэффициенты секций фильтра.
+        [n_sections, 6]
+
+    zi : ndarray[dtype: float64, dim = 2]
+        Начальные состояния секций для единичного скачка.
+        [n_sections, 2]
+
+    ext : ndarray[dtype: float64, dim = 2]
+        Продолженный блок трасс после прямого прохода.
+        [tempor_axis, spatial_axis]
+
+    padlen : int
+        Количество отсчётов продолжения на каждом краю.
+
+    resamp : int
+        Фактор прореживания.
+
+    z : ndarray[dtype: float64, dim = 3]
+        Массив состояний секций.
+        [n_sections, 2, spatial_axis]
+
+    out : ndarray[dtype: float64 | float32, dim = 2]
+        Массив прореженной сейсмической записи.
+        [tempor_axis, spatial_axis]
+
+    c0 : int
+        Индекс первой трассы блока.
+
+    """
+    n_sections = sos.shape[0]
+    n_ext, nb = ext.shape
+    nt = n_ext - 2 * padlen
+    for s in range(n_sections):
+        for k in range(nb):
+            z[s, 0, k] = zi[s, 0] * ext[n_ext - 1, k]
+            z[s, 1, k] = zi[s, 1] * ext[n_ext - 1, k]
+
+    y = np.empty(nb, dtype=np.float64)
+    for i in range(n_ext - 1, -1, -1):
+        for k in range(nb):
+            y[k] = ext[i, k]
+        for s in range(n_sections):
+            for k in range(nb):
+                xn = y[k]
+                yn = sos[s, 0] * xn + z[s, 0, k]
+                z[s, 0, k] = sos[s, 1] * xn - sos[s, 4] * yn + z[s, 1, k]
+                z[s, 1, k] = sos[s, 2] * xn - sos[s, 5] * yn
+                y[k] = yn
+
+        t = i - padlen
+        if 0 <= t < nt and t % resamp == 0:
+            for k in range(nb):
+                out[t // resamp, c0 + k] = y[k]
+
+
+@njit(parallel=True, fastmath=True, cache=True)
+def _sos_filtfilt_2d(sos, zi, x, padlen, block, resamp, out):
+    """
+    Двунаправленная фильтрация каскадом секций второго порядка.
+
+    Parameters
+    ----------
+    sos : ndarray[dtype: float64, dim = 2]
+        Коэффициенты секций фильтра.
+        [n_sections, 6]
+
+    zi : ndarray[dtype: float64, dim = 2]
+        Начальные состояния секций для единичного скачка.
+        [n_sections, 2]
+
+    x : ndarray[dtype: float64 | float32, dim = 2]
+        Массив сейсмической записи.
+        [tempor_axis, spatial_axis]
+
+    padlen : int
+        Количество отсчётов нечётного продолжения на краях.
+
+    block : int
+        Количество трасс, обрабатываемых одним потоком за раз.
+
+    resamp : int
+        Фактор прореживания.
+
+    out : ndarray[dtype: float64 | float32, dim = 2]
+        Массив для записи результата, при resamp = 1 может
+        совпадать с x.
+        [tempor_axis, spatial_axis]
+
+    """
+    nt, nx = x.shape
+    n_ext = nt + 2 * padlen
+    n_blocks = (nx + block - 1) // block
+
+    for b in prange(n_blocks):
+        c0 = b * block
+        nb = min(block, nx - c0)
+        ext = np.empty((n_ext, nb), dtype=np.float64)
+        z = np.empty((sos.shape[0], 2, nb), dtype=np.float64)
+
+        _odd_extend(x, c0, padlen, ext)
+        _sos_pass(sos, zi, ext, 0, n_ext, 1, z)
+        _sos_pass_decim(sos, zi, ext, padlen, resamp, z, out, c0)
+
+
+def sos_filtfilt_2d(sos, x, out=None, resamp=1, n_threads=None,
+                    padlen=None):
+    """
+    Двунаправленная фильтрация трасс вдоль оси времени.
+
+    Аналог scipy.signal.sosfiltfilt(sos, x, axis=0)[::resamp] с
+    нечётным продолжением на краях. При обратном проходе
+    записываются только сохраняемые отсчёты. Трассы обрабатываются
+    параллельно блоками, размер которых подобран под кэш L2.
+    Каждый блок считывается целиком до записи результата, поэтому
+    при resamp = 1 допускается фильтрация на месте (out=x).
+
+    Parameters
+    ----------
+    sos : ndarray[dtype: float64, dim = 2]
+        Коэффициенты секций фильтра.
+        [n_sections, 6]
+
+    x : ndarray[dtype: float64 | float32, dim = 2]
+        Массив сейсмической записи.
+        [tempor_axis, spatial_axis]
+
+    out : ndarray[dtype: float64 | float32, dim = 2] | None, default = None
+        Массив для записи результата. При None создаётся новый.
+        [tempor_axis, spatial_axis]
+
+    resamp : int, default = 1
+        Фактор прореживания.
+
+    n_threads : int | None, default = None
+        Количество потоков. При None используется текущее
+        количество потоков numba.
+
+    padlen : int | None, default = None
+        Количество отсчётов нечётного продолжения на краях. При None
+        используется значение scipy.signal.sosfiltfilt.
+
+    Returns
+    -------
+    out : ndarray[dtype: float64 | float32, dim = 2]
+        Отфильтрованный (и прореженный) массив сейсмической записи.
+        [tempor_axis, spatial_axis]
+
+    """
+    sos = np.ascontiguousarray(sos, dtype=np.float64)
+    if padlen is None:
+        zeros_b = np.count_nonzero(sos[:, 2] == 0)
+        zeros_a = np.count_nonzero(sos[:, 5] == 0)
+        padlen = 3 * (2 * len(sos) + 1 - min(zeros_b, zeros_a))
+
+    nt, nx = x.shape
+    if nt <= padlen:
+        raise ValueError("Количество отсчётов по времени должно быть"
+                         f" больше {padlen}")
+
+    nt_out = -(-nt // resamp)
+    if out is None:
+        out = np.empty((nt_out, nx), dtype=x.dtype)
+
+    if out.shape != (nt_out, nx):
+        raise ValueError("Размер выходного массива должен быть"
+                         f" равен {(nt_out, nx)}")
+
+    prev_threads = get_num_threads()
+    if n_threads is not None:
+        set_num_threads(min(n_threads, config.NUMBA_NUM_THREADS))
+
+    try:
+        # блоки продолженных трасс хранятся в float64, при этом
+        # каждый поток получает хотя бы один блок
+        block = min(block_size(nt + 2 * padlen, 8),
+                    -(-nx // get_num_threads()))
+
+        _sos_filtfilt_2d(sos, sosfilt_zi(sos), x, padlen, block, resamp,
+                         out)
+    finally:
+        set_num_threads(prev_threads)
+
+    return out
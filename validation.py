@@ -0,0 +1,53 @@
+"""
+Модуль проверки входных массивов.
+
+Используется в сеттерах классов Peaker и Receivers.
+"""
+
+import numpy as np
+
+
+def validate_1d(value, *, positive=True, increasing=False):
+    """
+    Проверка одномерного числового массива.
+
+    Parameters
+    ----------
+    value : ndarray[dtype: float | int, dim = 1]
+        Проверяемый массив.
+
+    positive : bool, default = True
+        Требовать ли, чтобы все элементы массива были положительными.
+
+    increasing : bool, default = False
+        Требовать ли, чтобы массив строго возрастал.
+
+    Returns
+    -------
+    value : ndarray[dtype: float64, dim = 1]
+        Массив в типе float64, без копирования для float64.
+
+    """
+    if not isinstance(value, np.ndarray):
+        raise ValueError("Подаваемый массив должен быть типа"
+                         " numpy.ndarray")
+
+    if value.ndim != 1:
+        raise ValueError("Размер массива должен быть равен 1")
+
+    if value.size == 0:
+        raise ValueError("Подаваемый массив не должен быть пустым")
+
+    if value.dtype.kind not in 'fi':
+        raise ValueError("Подаваемый массив должен состоять из целых"
+                         " или вещественных чисел")
+
+    value = value.astype(np.float64, copy=False)
+    if positive and value.min() <= 0:
+        raise ValueError("Подаваемый массив должен состоять из "
+                         "положительных чисел")
+
+    if increasing and (np.diff(value) <= 0).any():
+        raise ValueError("Подаваемый массив должен строго возрастать")
+
+    return value